@@ -4,7 +4,8 @@ Single-file Flask + Mesa prototype with enhanced UI
 
 Requirements:
 - Python 3.8+
-- pip install mesa flask pandas
+- pip install mesa flask pandas numpy orjson waitress flask-compress
+- optional: pip install numba (JIT-compiles the scheduler/optimizer kernels)
 
 Run:
     pip install -r requirements.txt
@@ -12,56 +13,229 @@ Run:
 
 Open http://127.0.0.1:5000
 
+Set SIM_SPEED=N to advance N model steps (5 simulated minutes each) per loop tick.
+Set MAX_STREAMS=N (default 4) to allow N live-updating tabs at once; each holds a server thread
+and the oldest tab falls back to polling when another one opens.
+
 This file implements the Mesa multi-agent model and a Flask UI with Bootstrap + Chart.js charts
 showing productivity metrics (tasks remaining over time, focus distribution, reminders, and task list).
 """
 
-from flask import Flask, render_template_string, jsonify, request
+from flask import Flask, request
+from flask_compress import Compress
 from mesa import Agent, Model
-from mesa.time import BaseScheduler
 from mesa.datacollection import DataCollector
+import atexit
+import os
+import queue
+import struct
 import threading
-import time
+import traceback
 import uuid
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+import orjson
 import pandas as pd
 from collections import deque, defaultdict
+from itertools import takewhile
+from operator import attrgetter
+
+try:
+    from numba import njit
+except ImportError:  # fall back to the vectorized NumPy kernels
+    njit = None
 
 # ------------------------
 # Core simulation classes
 # ------------------------
 
+NO_DEADLINE = 10**9  # sort key for tasks without a deadline
+DAY_MINUTES = 24 * 60
+
+def parse_minutes(value):
+    """Parse a deadline such as '13:30' or '90' into minutes from the start of the day.
+
+    Any other string (e.g. a date), or a time outside the day, can't be placed
+    on the day's timeline and sorts like a task without a deadline.
+    """
+    try:
+        if ':' in value:
+            hours, minutes = value.split(':', 1)
+            return deadline_minutes(int(hours) * 60 + int(minutes))
+        return deadline_minutes(int(value))
+    except ValueError:
+        return NO_DEADLINE
+
+def deadline_minutes(minutes):
+    """Deadline sort key for a minute of the day; NO_DEADLINE if it's outside the day."""
+    return minutes if 0 <= minutes <= DAY_MINUTES else NO_DEADLINE
+
+def task_store_layout(n):
+    """Column dtypes and 8-byte aligned offsets for packing a task store into one buffer."""
+    layout, offset = [], 0
+    for k, col in new_task_store(n).items():
+        layout.append((k, col.dtype, offset))
+        offset += -(-col.nbytes // 8) * 8
+    return layout, offset
+
+def shared_task_store(buf, n):
+    """Task store whose columns are views into buf (e.g. a SharedMemory buffer)."""
+    layout, _ = task_store_layout(n)
+    return {k: np.ndarray(n, dtype=dtype, buffer=buf, offset=offset) for k, dtype, offset in layout}
+
+def new_task_store(n):
+    """Allocate the struct-of-arrays task store for n tasks (slot -1 = unscheduled)."""
+    return {
+        'deadline': np.full(n, NO_DEADLINE, dtype=np.int32),
+        'prio': np.zeros(n, dtype=np.int32),
+        'est': np.zeros(n, dtype=np.int32),
+        'slot': np.full(n, -1, dtype=np.int32),
+        'spent': np.zeros(n, dtype=np.int32),
+        'done': np.zeros(n, dtype=bool),
+        'dirty': np.zeros(n, dtype=np.int32),  # model minute of the last change
+    }
+
 class Task:
+    """Thin view over one row of a task store.
+
+    A new task owns a private one-row store; UserModel rebinds it to the
+    shared arrays so the agents can work on whole columns at once.
+    """
+    __slots__ = ('id', 'title', 'deadline', 'deadline_key', '_arr', '_idx')
+
     def __init__(self, title, est_minutes, priority=3, deadline=None):
         self.id = str(uuid.uuid4())
         self.title = title
+        self.deadline = deadline
+        self.deadline_key = deadline_minutes(deadline) if isinstance(deadline, int) else (parse_minutes(deadline) if deadline else NO_DEADLINE)
+        self._arr = new_task_store(1)
+        self._idx = 0
+        self._arr['deadline'][0] = self.deadline_key
         self.est_minutes = est_minutes
         self.priority = priority  # 1 (highest) - 5 (lowest)
-        self.deadline = deadline
-        self.assigned_slot = None
-        self.time_spent = 0
-        self.completed = False
+
+    def _bind(self, arr, idx):
+        for k, col in arr.items():
+            col[idx] = self._arr[k][self._idx]
+        self._arr = arr
+        self._idx = idx
+
+    @property
+    def est_minutes(self):
+        return int(self._arr['est'][self._idx])
+
+    @est_minutes.setter
+    def est_minutes(self, value):
+        self._arr['est'][self._idx] = value
+
+    @property
+    def priority(self):
+        return int(self._arr['prio'][self._idx])
+
+    @priority.setter
+    def priority(self, value):
+        self._arr['prio'][self._idx] = value
+
+    @property
+    def assigned_slot(self):
+        slot = int(self._arr['slot'][self._idx])
+        return None if slot < 0 else slot
+
+    @assigned_slot.setter
+    def assigned_slot(self, value):
+        self._arr['slot'][self._idx] = -1 if value is None else value
+
+    @property
+    def time_spent(self):
+        return int(self._arr['spent'][self._idx])
+
+    @time_spent.setter
+    def time_spent(self, value):
+        self._arr['spent'][self._idx] = value
+
+    @property
+    def completed(self):
+        return bool(self._arr['done'][self._idx])
+
+    @completed.setter
+    def completed(self, value):
+        self._arr['done'][self._idx] = value
 
     def to_dict(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'est_minutes': self.est_minutes,
-            'priority': self.priority,
-            'deadline': self.deadline,
-            'assigned_slot': self.assigned_slot,
-            'time_spent': self.time_spent,
-            'completed': self.completed
-        }
+        return dict(zip(_TASK_KEYS, _TASK_GET(self)))
+
+_TASK_KEYS = ('id', 'title', 'est_minutes', 'priority', 'deadline', 'assigned_slot', 'time_spent', 'completed')
+_TASK_GET = attrgetter(*_TASK_KEYS)
+
+# ------------------------
+# Numeric kernels over the task store
+# ------------------------
+
+def _optimize_np(est, prio, done, dirty, now):
+    """Bump priority of short tasks when more than 3 remain (updates prio and dirty in place)."""
+    remaining = ~done
+    if remaining.sum() <= 3:
+        return
+    avg_est = est[remaining].mean()
+    bump = remaining & (est < avg_est * 0.6) & (prio > 1)
+    prio[bump] -= 1
+    dirty[bump] = now
+
+def _schedule_np(slot, order, est, current_min):
+    """Assign back-to-back slots (each at least 30 minutes) to tasks in order."""
+    durations = np.maximum(30, est[order])
+    starts = np.concatenate(([0], np.cumsum(durations)[:-1]))
+    slot[order] = current_min + starts
+
+def _optimize_loop(est, prio, done, dirty, now):
+    n_remaining = 0
+    total = 0.0
+    for i in range(est.shape[0]):
+        if not done[i]:
+            n_remaining += 1
+            total += est[i]
+    if n_remaining <= 3:
+        return
+    cutoff = total / n_remaining * 0.6
+    for i in range(est.shape[0]):
+        if not done[i] and est[i] < cutoff and prio[i] > 1:
+            prio[i] -= 1
+            dirty[i] = now
+
+def _schedule_loop(slot, order, est, current_min):
+    for i in order:
+        slot[i] = current_min
+        current_min += max(30, est[i])
+
+if njit is not None:
+    _optimize = njit(cache=True)(_optimize_loop)
+    _schedule = njit(cache=True)(_schedule_loop)
+else:
+    _optimize = _optimize_np
+    _schedule = _schedule_np
 
 class UserModel(Model):
     """Mesa model coordinating agents and tasks."""
-    def __init__(self, tasks=None):
+    def __init__(self, tasks=None, store=None):
         super().__init__()
-        self.schedule = BaseScheduler(self)
         self.time_minute = 0  # simulated minutes passed in the day
         self.tasks = tasks or []
-        self.reminders = deque()
-        self.focus_log = []
+        self.reminders = deque()  # (minute, text), newest first
+        self._reminder_set = set()  # mirrors reminder texts for O(1) dedup
+        self.focus_log = deque(maxlen=2000)
+        self._focus_sum = defaultdict(int)  # worked minutes per task title over the whole run
+        self.num_completed = 0  # kept in sync by FocusMonitorAgent
+        self.run_id = uuid.uuid4().hex  # ties to_json checkpoints to this model instance
+
+        # Struct-of-arrays task store; each Task becomes a view on its row
+        self._arr = new_task_store(len(self.tasks)) if store is None else store
+        for i, t in enumerate(self.tasks):
+            t._bind(self._arr, i)
+        self._needs_schedule = True  # tasks are fixed at construction; cleared by SchedulerAgent
+        # Scheduled task rows ordered by slot start, rebuilt by SchedulerAgent
+        self._slot_order = np.zeros(0, dtype=np.intp)
+        self._slot_starts = np.zeros(0, dtype=np.int32)
 
         # Create agents
         self.scheduler_agent = SchedulerAgent('scheduler', self)
@@ -70,30 +244,82 @@ class UserModel(Model):
         self.focus_agent = FocusMonitorAgent('focus', self)
         self.report_agent = ReportGeneratorAgent('report', self)
 
-        for a in [self.scheduler_agent, self.optimizer_agent, self.reminder_agent, self.focus_agent, self.report_agent]:
-            self.schedule.add(a)
+        # Agent steps in a fixed order; called directly instead of via a Mesa scheduler
+        self._step_fns = (self.scheduler_agent.step, self.optimizer_agent.step,
+                          self.reminder_agent.step, self.focus_agent.step)
 
         # Data collector (simple)
         self.datacollector = DataCollector(
             model_reporters={
                 'time_minute': lambda m: m.time_minute,
-                'tasks_remaining': lambda m: len([t for t in m.tasks if not t.completed]),
-                'tasks_completed': lambda m: len([t for t in m.tasks if t.completed])
+                'tasks_remaining': lambda m: len(m.tasks) - m.num_completed,
+                'tasks_completed': lambda m: m.num_completed
             }
         )
+        # Chart series kept as plain lists so /chart-data needs no DataFrame
+        self._labels = []
+        self._rem = []
+        self._done = []
 
     def step(self):
         # One model step will represent 5 simulated minutes
         self.time_minute += 5
-        self.schedule.step()
-        self.datacollector.collect(self)
+        for fn in self._step_fns:
+            fn()
+        self._record()
 
-    def to_json(self):
+    def _record(self):
+        self.datacollector.collect(self)
+        self._labels.append(f"{self.time_minute}m")
+        self._rem.append(len(self.tasks) - self.num_completed)
+        self._done.append(self.num_completed)
+
+    def replay_step(self, time_minute, num_completed, focus, reminders):
+        """Apply a step taken by a model in another process (task columns are copied separately)."""
+        self.time_minute = time_minute
+        self.num_completed = num_completed
+        self.log_focus(focus['task'], focus['worked'])
+        for entry in reversed(reminders):
+            self.reminders.appendleft(entry)
+        while len(self.reminders) > 50:
+            self.reminders.pop()
+        self._record()
+
+    def log_focus(self, task, worked):
+        self.focus_log.append({'minute': self.time_minute, 'task': task, 'worked': worked})
+        self._focus_sum[task or 'Idle'] += worked
+
+    def _checkpoint_minute(self, token):
+        """Model minute of a '<run_id>:<minute>' checkpoint, or None if it isn't one of ours."""
+        run_id, _, minute = (token or '').rpartition(':')
+        if run_id != self.run_id or not minute.isdigit() or int(minute) > self.time_minute:
+            return None
+        return int(minute)
+
+    def to_json(self, since=None):
+        """Full snapshot, or only what changed after the `since` checkpoint.
+
+        Checkpoints are the 'checkpoint' value of an earlier payload. One from
+        another model (e.g. before a reset) or otherwise invalid gets a full
+        snapshot; 'full' tells the client whether to replace or merge.
+        """
+        since = self._checkpoint_minute(since)
+        full = since is None
+        if full:
+            tasks = self.tasks
+            reminders = self.reminders
+            focus_log = list(self.focus_log)
+        else:
+            tasks = [self.tasks[i] for i in np.flatnonzero(self._arr['dirty'] > since)]
+            reminders = takewhile(lambda r: r[0] > since, self.reminders)
+            focus_log = list(takewhile(lambda e: e['minute'] > since, reversed(self.focus_log)))[::-1]
         return {
             'time_minute': self.time_minute,
-            'tasks': [t.to_dict() for t in self.tasks],
-            'reminders': list(self.reminders),
-            'focus_log': list(self.focus_log)
+            'checkpoint': f"{self.run_id}:{self.time_minute}",
+            'full': full,
+            'tasks': [t.to_dict() for t in tasks],
+            'reminders': [text for _, text in reminders],
+            'focus_log': focus_log
         }
 
 # ------------------------
@@ -105,22 +331,23 @@ class SchedulerAgent(Agent):
         super().__init__(unique_id, model)
 
     def step(self):
+        if not self.model._needs_schedule:
+            return
+        self.model._needs_schedule = False
+        arr = self.model._arr
+        slot = arr['slot']
+        unscheduled = np.flatnonzero((slot < 0) & ~arr['done'])
+        if not unscheduled.size:
+            return
         # Basic scheduling: sort by priority then earliest deadline
-        unscheduled = [t for t in self.model.tasks if t.assigned_slot is None and not t.completed]
-        unscheduled.sort(key=lambda x: (x.priority, x.deadline or '9999'))
-        # Assign in contiguous slots (each slot = 30 minutes) until day end (480 minutes)
-        # Try to respect existing assigned tasks
-        used = []
-        for t in self.model.tasks:
-            if t.assigned_slot is not None and not t.completed:
-                used.append((t.assigned_slot, t.assigned_slot + max(30, t.est_minutes)))
-        current_minute = max(0, self.model.time_minute)
-        for t in unscheduled:
-            # find first gap starting from current_minute
-            slot = current_minute
-            # naive: just assign at current_minute
-            t.assigned_slot = slot
-            current_minute += max(30, t.est_minutes)
+        order = unscheduled[np.lexsort((arr['deadline'][unscheduled], arr['prio'][unscheduled]))]
+        _schedule(slot, order, arr['est'], max(0, self.model.time_minute))
+        arr['dirty'][order] = self.model.time_minute
+        # Index open slots by start minute so FocusMonitorAgent can binary-search
+        scheduled = np.flatnonzero((slot >= 0) & ~arr['done'])
+        by_start = scheduled[np.argsort(slot[scheduled], kind='stable')]
+        self.model._slot_order = by_start
+        self.model._slot_starts = slot[by_start]
 
 class TaskOptimizerAgent(Agent):
     def __init__(self, unique_id, model):
@@ -128,13 +355,8 @@ class TaskOptimizerAgent(Agent):
 
     def step(self):
         # Simple optimizer: if many tasks remaining, bump priority of short tasks
-        remaining = [t for t in self.model.tasks if not t.completed]
-        if not remaining:
-            return
-        avg_est = sum(t.est_minutes for t in remaining) / len(remaining)
-        for t in remaining:
-            if t.est_minutes < avg_est * 0.6 and len(remaining) > 3:
-                t.priority = max(1, t.priority - 1)
+        arr = self.model._arr
+        _optimize(arr['est'], arr['prio'], arr['done'], arr['dirty'], self.model.time_minute)
 
 class ReminderAgent(Agent):
     def __init__(self, unique_id, model):
@@ -143,14 +365,17 @@ class ReminderAgent(Agent):
     def step(self):
         # Remind tasks whose assigned slot is near (within 30 simulated minutes)
         now = self.model.time_minute
-        for t in self.model.tasks:
-            if not t.completed and t.assigned_slot is not None:
-                if 0 <= t.assigned_slot - now <= 30:
-                    text = f"Reminder: '{t.title}' starts at minute {t.assigned_slot}."
-                    if text not in self.model.reminders:
-                        self.model.reminders.appendleft(text)
-                        while len(self.model.reminders) > 50:
-                            self.model.reminders.pop()
+        arr = self.model._arr
+        lead = arr['slot'] - now
+        near = ~arr['done'] & (arr['slot'] >= 0) & (lead >= 0) & (lead <= 30)
+        for i in np.flatnonzero(near):
+            t = self.model.tasks[i]
+            text = f"Reminder: '{t.title}' starts at minute {t.assigned_slot}."
+            if text not in self.model._reminder_set:
+                self.model.reminders.appendleft((now, text))
+                self.model._reminder_set.add(text)
+                while len(self.model.reminders) > 50:
+                    self.model._reminder_set.discard(self.model.reminders.pop()[1])
 
 class FocusMonitorAgent(Agent):
     def __init__(self, unique_id, model):
@@ -161,37 +386,65 @@ class FocusMonitorAgent(Agent):
     def step(self):
         # Work on the task scheduled now
         now = self.model.time_minute
-        for t in self.model.tasks:
-            if t.assigned_slot is not None and not t.completed:
-                start = t.assigned_slot
-                end = t.assigned_slot + t.est_minutes
-                if start <= now < end:
-                    t.time_spent += 5
-                    self.model.focus_log.append({'minute': now, 'task': t.title, 'worked': 5})
-                    if t.time_spent >= t.est_minutes:
-                        t.completed = True
-                        self.model.reminders.appendleft(f"Completed: {t.title}")
-                    return
+        arr = self.model._arr
+        # Only the latest slot starting at or before now can contain it
+        k = np.searchsorted(self.model._slot_starts, now, side='right') - 1
+        i = self.model._slot_order[k] if k >= 0 else None
+        if i is not None and not arr['done'][i] and now < arr['slot'][i] + arr['est'][i]:
+            t = self.model.tasks[i]
+            arr['spent'][i] += 5
+            arr['dirty'][i] = now
+            self.model.log_focus(t.title, 5)
+            if arr['spent'][i] >= arr['est'][i]:
+                arr['done'][i] = True
+                self.model.num_completed += 1
+                self.model.reminders.appendleft((now, f"Completed: {t.title}"))
+            return
         # idle
-        self.model.focus_log.append({'minute': now, 'task': None, 'worked': 0})
+        self.model.log_focus(None, 0)
 
 class ReportGeneratorAgent(Agent):
     def __init__(self, unique_id, model):
         super().__init__(unique_id, model)
 
-    def step(self):
-        # placeholder - heavy reports generated on demand
-        return
+    # Not part of the per-tick step order; reports are generated on demand by /report
+
+    def generate(self, tasks):
+        """Summarize a snapshot of task dicts, or return None if there are no tasks."""
+        df = pd.DataFrame(tasks)
+        if df.empty:
+            return None
+        completed = df[df['completed']]
+        pct_done = 0 if len(df)==0 else round(len(completed)/len(df)*100,2)
+        avg_effort = round(df['est_minutes'].mean(),2)
+        return {
+            'total_tasks': len(df),
+            'completed': len(completed),
+            'pct_done': pct_done,
+            'avg_est_minutes': avg_effort,
+        }
 
 # ------------------------
 # Flask app + threading
 # ------------------------
 
 app = Flask(__name__)
-MODEL = None
-SIM_THREAD = None
+Compress(app)  # gzip/br responses for clients that accept them
+MODEL = None  # local mirror of the model stepped by SIM
+SIM = None  # SimProcess running the simulation
 SIM_LOCK = threading.Lock()
-RUNNING = False
+# Spawned, not forked: a forked child would inherit the server's sockets (including
+# the listening one) and keep the port bound if the server died first
+SIM_MP = mp.get_context('spawn')
+SIM_SPEED = int(os.getenv('SIM_SPEED', '1'))  # model steps per loop tick
+SIM_COND = threading.Condition()  # notified by publish_step() whenever the model changes
+SIM_VERSION = 0
+# Each /events stream pins a server thread for as long as the tab is open, so cap them
+# and size the thread pool so ordinary requests always have workers left
+MAX_STREAMS = int(os.getenv('MAX_STREAMS', '4'))
+STREAMS = deque()  # stop flags of the open /events streams, oldest first
+STREAMS_LOCK = threading.Lock()
+_CACHE = {}  # route -> model key, route + '_json' -> serialized body
 
 # Enhanced HTML with Bootstrap and Chart.js
 HTML = '''
@@ -264,16 +517,23 @@ HTML = '''
 
 <script>
 let lineChart=null, donutChart=null;
-async function fetchState(){
-  const r = await fetch('/state');
-  const j = await r.json();
+let taskMap=new Map(), reminders=[], focusLog=[], checkpoint=null;
+function renderState(j){
+  // merge the diff (or replace everything on a full snapshot)
+  if(j.full){ taskMap=new Map(); reminders=[]; focusLog=[]; }
+  checkpoint = j.checkpoint;
+  j.tasks.forEach(t=>taskMap.set(t.id, t));
+  reminders = j.reminders.concat(reminders).slice(0,50);
+  focusLog = focusLog.concat(j.focus_log).slice(-50);
+  const tasks = [...taskMap.values()];
+
   document.getElementById('time').innerText = j.time_minute;
-  document.getElementById('tasks_remaining').innerText = j.tasks.filter(t=>!t.completed).length;
-  document.getElementById('tasks_completed').innerText = j.tasks.filter(t=>t.completed).length;
+  document.getElementById('tasks_remaining').innerText = tasks.filter(t=>!t.completed).length;
+  document.getElementById('tasks_completed').innerText = tasks.filter(t=>t.completed).length;
 
   // task list
   const tl = document.getElementById('task-list'); tl.innerHTML='';
-  j.tasks.forEach(t=>{
+  tasks.forEach(t=>{
     const div = document.createElement('div'); div.className='mb-2';
     div.innerHTML = `<div class='d-flex justify-content-between'><div><strong>${t.title}</strong><div class='small-muted'>${t.est_minutes}m • priority ${t.priority}</div></div><div class='text-end'>${t.assigned_slot===null?'<span class="badge bg-secondary">unscheduled</span>':'<span class="badge bg-info task-badge">slot '+t.assigned_slot+'</span>'}${t.completed?'<div class="text-success">✓ done</div>':''}</div></div>`;
     tl.appendChild(div);
@@ -281,17 +541,14 @@ async function fetchState(){
 
   // reminders
   const rem = document.getElementById('reminders'); rem.innerHTML='';
-  j.reminders.slice(0,20).forEach(rm=>{ const li=document.createElement('li'); li.innerText=rm; rem.appendChild(li); });
+  reminders.slice(0,20).forEach(rm=>{ const li=document.createElement('li'); li.innerText=rm; rem.appendChild(li); });
 
   // focus log
   const flog = document.getElementById('focus_log'); flog.innerHTML='';
-  j.focus_log.slice(-50).reverse().forEach(fl=>{ const li=document.createElement('li'); li.className='list-group-item list-group-item-light'; li.innerText = `${fl.minute}m — ${fl.task || 'idle'} (+${fl.worked}m)`; flog.appendChild(li); });
+  focusLog.slice().reverse().forEach(fl=>{ const li=document.createElement('li'); li.className='list-group-item list-group-item-light'; li.innerText = `${fl.minute}m — ${fl.task || 'idle'} (+${fl.worked}m)`; flog.appendChild(li); });
 }
 
-async function fetchCharts(){
-  const r = await fetch('/chart-data');
-  const d = await r.json();
-
+function renderCharts(d){
   // line chart: tasks_remaining
   const ctx = document.getElementById('lineChart').getContext('2d');
   if(lineChart) lineChart.destroy();
@@ -326,21 +583,39 @@ async function fetchCharts(){
   });
 }
 
-let poll=null;
-function startPolling(){ if(!poll) poll = setInterval(()=>{ fetchState(); fetchCharts(); }, 1200); }
-startPolling();
+// the server pushes state + chart data whenever the model changes (including the initial draw)
+// if the stream drops (or another tab takes its slot) poll /state?since= until it is back
+let events=null, pollTimer=null, retryDelay=1000;
+async function poll(){
+  const q = checkpoint ? '?since='+encodeURIComponent(checkpoint) : '';
+  const s = await fetch('/state'+q); if(s.ok) renderState(await s.json());
+  const c = await fetch('/chart-data'); if(c.ok) renderCharts(await c.json());
+}
+function startPolling(){ if(!pollTimer) pollTimer = setInterval(()=>poll().catch(()=>{}), 2000); }
+function stopPolling(){ clearInterval(pollTimer); pollTimer=null; }
+function connect(){
+  events = new EventSource('/events');
+  events.onopen = ()=>{ retryDelay=1000; stopPolling(); };
+  events.onmessage = e=>{ const m = JSON.parse(e.data); renderState(m.state); renderCharts(m.charts); };
+  events.addEventListener('evicted', ()=>{ events.close(); startPolling(); });
+  events.onerror = ()=>{
+    if(events.readyState !== EventSource.CLOSED) return;  // the browser is already retrying
+    startPolling();
+    setTimeout(connect, retryDelay);
+    retryDelay = Math.min(retryDelay*2, 30000);
+  };
+}
+connect();
 
 async function startSim(){ await fetch('/start', {method:'POST'}); }
 async function stopSim(){ await fetch('/stop', {method:'POST'}); }
-async function stepSim(){ await fetch('/step', {method:'POST'}); await fetchState(); await fetchCharts(); }
-async function resetSim(){ await fetch('/reset', {method:'POST'}); await fetchState(); await fetchCharts(); }
-
-// initial draw
-fetchState(); fetchCharts();
+async function stepSim(){ await fetch('/step', {method:'POST'}); }
+async function resetSim(){ await fetch('/reset', {method:'POST'}); }
 </script>
 </body>
 </html>
 '''
+RENDERED_HTML = HTML  # the page has no template variables, so no per-request Jinja render
 
 # Helper to create demo tasks
 def sample_tasks():
@@ -354,120 +629,324 @@ def sample_tasks():
 
 @app.route('/')
 def index():
-    return render_template_string(HTML)
+    return app.response_class(RENDERED_HTML, mimetype='text/html')
+
+def replace_sim(only_if_dead=False):
+    """Start a fresh SimProcess (and mirror model), shutting down the previous one."""
+    global MODEL, SIM
+    with SIM_LOCK:
+        if only_if_dead and SIM is not None and SIM.alive():
+            return SIM
+        old, SIM = SIM, SimProcess(sample_tasks())
+        MODEL = SIM.mirror
+        _CACHE.clear()
+        sim = SIM
+    publish_step()
+    if old is not None:
+        old.close()  # outside SIM_LOCK: its pump thread may be waiting for the lock
+    return sim
+
+def ensure_sim():
+    """The running SimProcess, restarted from scratch if there is none or it died."""
+    return replace_sim(only_if_dead=True)
+
+@atexit.register
+def shutdown_sim():
+    if SIM is not None:
+        SIM.close()
 
 @app.route('/start', methods=['POST'])
 def start():
-    global MODEL, SIM_THREAD, RUNNING
-    with SIM_LOCK:
-        if MODEL is None:
-            MODEL = UserModel(tasks=sample_tasks())
-        if RUNNING:
-            return ('', 204)
-        RUNNING = True
-        SIM_THREAD = threading.Thread(target=run_sim_loop, daemon=True)
-        SIM_THREAD.start()
+    ensure_sim().control.put('start')
     return ('', 204)
 
 @app.route('/stop', methods=['POST'])
 def stop():
-    global RUNNING
-    with SIM_LOCK:
-        RUNNING = False
+    if SIM is not None:
+        SIM.control.put('stop')
     return ('', 204)
 
 @app.route('/step', methods=['POST'])
 def step_once():
-    global MODEL
-    with SIM_LOCK:
-        if MODEL is None:
-            MODEL = UserModel(tasks=sample_tasks())
-        MODEL.step()
+    ensure_sim().control.put('step')
     return ('', 204)
 
 @app.route('/reset', methods=['POST'])
 def reset():
-    global MODEL, RUNNING
-    with SIM_LOCK:
-        MODEL = UserModel(tasks=sample_tasks())
-        RUNNING = False
+    replace_sim()
     return ('', 204)
 
+def ojson(obj):
+    """JSON response serialized with orjson (numpy scalars/arrays included)."""
+    return app.response_class(orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY),
+                              mimetype='application/json')
+
+def cached_body(route, snapshot, render=None):
+    """Return route's JSON bytes from _CACHE unless the model advanced since they were built.
+
+    Only snapshot() runs under SIM_LOCK and it should just copy model state;
+    render() and serialization happen after the lock is released.
+    """
+    with SIM_LOCK:
+        model = MODEL
+        key = (model.time_minute, len(model.tasks), model.num_completed)
+        if _CACHE.get(route) == key:
+            return _CACHE[route + '_json']
+        data = snapshot()
+    body = orjson.dumps(render(data) if render else data, option=orjson.OPT_SERIALIZE_NUMPY)
+    with SIM_LOCK:
+        if MODEL is model:
+            _CACHE[route] = key
+            _CACHE[route + '_json'] = body
+    return body
+
+def cached_json(route, snapshot, render=None):
+    return app.response_class(cached_body(route, snapshot, render), mimetype='application/json')
+
+def publish_step():
+    """Wake /events streams after the model stepped or was replaced."""
+    global SIM_VERSION
+    with SIM_COND:
+        SIM_VERSION += 1
+        SIM_COND.notify_all()
+
 @app.route('/state')
 def state():
     global MODEL
     if MODEL is None:
-        return jsonify({'error':'no model initialized'}), 400
-    return jsonify(MODEL.to_json())
+        return ojson({'error':'no model initialized'}), 400
+    since = request.args.get('since')
+    if since is not None:
+        # Diffs depend on the caller's checkpoint, so they bypass the cache
+        with SIM_LOCK:
+            data = MODEL.to_json(since)
+        return ojson(data)
+    return cached_json('state', state_snapshot)
+
+def state_snapshot():
+    return MODEL.to_json()
 
 @app.route('/report')
 def report():
     global MODEL
     if MODEL is None:
-        return jsonify({'error':'no model initialized'}), 400
-    df = pd.DataFrame([t.to_dict() for t in MODEL.tasks])
-    if df.empty:
-        return jsonify({'error':'no tasks'}), 400
-    completed = df[df['completed']]
-    pct_done = 0 if len(df)==0 else round(len(completed)/len(df)*100,2)
-    avg_effort = round(df['est_minutes'].mean(),2)
-    report = {
-        'total_tasks': len(df),
-        'completed': len(completed),
-        'pct_done': pct_done,
-        'avg_est_minutes': avg_effort,
-    }
-    return jsonify(report)
+        return ojson({'error':'no model initialized'}), 400
+    with SIM_LOCK:
+        report_agent = MODEL.report_agent
+        tasks_snap = [t.to_dict() for t in MODEL.tasks]
+    report = report_agent.generate(tasks_snap)
+    if report is None:
+        return ojson({'error':'no tasks'}), 400
+    return ojson(report)
 
 @app.route('/chart-data')
 def chart_data():
     """Return data for charts: tasks remaining/completed over time and focus distribution."""
     global MODEL
     if MODEL is None:
-        return jsonify({'error':'no model initialized'}), 400
+        return ojson({'error':'no model initialized'}), 400
+    return cached_json('chart-data', chart_snapshot, chart_payload)
 
-    # Get time series from datacollector if available
-    try:
-        df = MODEL.datacollector.get_model_vars_dataframe()
-        labels = [str(int(x)) + 'm' for x in df['time_minute'].tolist()]
-        tasks_remaining = df['tasks_remaining'].tolist()
-        tasks_completed = df['tasks_completed'].tolist()
-    except Exception:
-        labels = []
-        tasks_remaining = []
-        tasks_completed = []
-
-    # Focus distribution: sum worked minutes per task
-    focus = defaultdict(int)
-    for e in MODEL.focus_log:
-        if e['task']:
-            focus[e['task']] += e['worked']
-        else:
-            focus['Idle'] += e['worked']
-    focus_items = sorted(focus.items(), key=lambda x: -x[1])
+def chart_snapshot():
+    return (list(MODEL._labels), list(MODEL._rem), list(MODEL._done),
+            list(MODEL._focus_sum.items()))
+
+def chart_payload(snap):
+    labels, tasks_remaining, tasks_completed, focus_items = snap
+    # Focus distribution: worked minutes per task, summed as the log is written
+    focus_items.sort(key=lambda x: -x[1])
     focus_labels = [k for k,v in focus_items]
     focus_values = [v for k,v in focus_items]
 
-    return jsonify({
+    return {
         'labels': labels,
         'tasks_remaining': tasks_remaining,
         'tasks_completed': tasks_completed,
         'focus_labels': focus_labels,
         'focus_values': focus_values
-    })
+    }
+
+@app.route('/events')
+def events():
+    """Server-sent events: push state and chart data each time the model changes.
+
+    At most MAX_STREAMS streams are served at once; opening another one ends the oldest
+    with an 'evicted' event, after which that client polls /state instead.
+    """
+    stop = threading.Event()
+    with STREAMS_LOCK:
+        STREAMS.append(stop)
+        while len(STREAMS) > MAX_STREAMS:
+            STREAMS.popleft().set()
+    with SIM_COND:
+        SIM_COND.notify_all()  # wake any evicted stream so it frees its thread now
+
+    def drop_stream():
+        with STREAMS_LOCK:
+            if stop in STREAMS:
+                STREAMS.remove(stop)
+
+    def generate():
+        seen = None
+        since = None
+        while True:
+            with SIM_COND:
+                SIM_COND.wait_for(lambda: stop.is_set() or (MODEL is not None and SIM_VERSION != seen),
+                                  timeout=15)
+                version = SIM_VERSION
+            if stop.is_set():
+                yield b'event: evicted\ndata: {}\n\n'
+                return
+            if MODEL is None or version == seen:
+                yield b': keep-alive\n\n'  # also lets the server notice closed clients
+                continue
+            seen = version
+            # Each stream sends only what changed since its last message, in full after a reset
+            with SIM_LOCK:
+                state = MODEL.to_json(since)
+            since = state['checkpoint']
+            state_body = orjson.dumps(state, option=orjson.OPT_SERIALIZE_NUMPY)
+            chart_body = cached_body('chart-data', chart_snapshot, chart_payload)
+            yield b'data: {"state":' + state_body + b',"charts":' + chart_body + b'}\n\n'
+    response = app.response_class(generate(), mimetype='text/event-stream',
+                                  headers={'Cache-Control': 'no-cache'})
+    response.call_on_close(drop_stream)
+    return response
 
-# Simulation loop runs in background thread when started
+# ------------------------
+# Simulation process
+# ------------------------
 
-def run_sim_loop():
-    global MODEL, RUNNING
+class SimProcess:
+    """Runs a UserModel in a child process so stepping never holds the GIL of the web server.
+
+    The child steps its model with the task columns placed in shared memory,
+    under `lock`. Every step it sends the rest of what changed (time, focus
+    entry, new reminders) on the bounded `events` queue. A pump thread replays
+    those onto `mirror`, a local UserModel, copying the shared task columns
+    into it; the routes read only the mirror. Commands ('start', 'stop',
+    'step', 'quit') go to the child on `control`.
+    """
+    def __init__(self, tasks):
+        self.mirror = UserModel(tasks=tasks)
+        _, self._minute_offset = task_store_layout(len(tasks))
+        # Task columns followed by the model minute they were last written at
+        self.shm = shared_memory.SharedMemory(create=True, size=self._minute_offset + 8)
+        self.lock = SIM_MP.Lock()
+        self.control = SIM_MP.Queue()
+        self.events = SIM_MP.Queue(maxsize=256)
+        self.process = SIM_MP.Process(target=sim_main, daemon=True,
+                                      args=(tasks, self.shm.name, self.lock, self.control, self.events))
+        self.process.start()
+        self.pump = threading.Thread(target=self._pump, daemon=True)
+        self.pump.start()
+
+    def _pump(self):
+        while True:
+            msg = self._next_event()
+            if msg is None:
+                return
+            pending = [msg]
+            if not self._acquire_child_lock():
+                return
+            try:
+                # The child can't step while we hold its lock, so collect messages up to
+                # the step the shared columns belong to before copying them; otherwise
+                # task rows would be served with an older time, log and counters
+                shared_minute, = struct.unpack_from('q', self.shm.buf, self._minute_offset)
+                while pending[-1][0] < shared_minute:
+                    msg = self._next_event()
+                    if msg is None:
+                        return
+                    pending.append(msg)
+                # Copies of transient views, so the shared buffer has no exports left when closed
+                rows = {k: col.copy() for k, col in shared_task_store(self.shm.buf, len(self.mirror.tasks)).items()}
+            finally:
+                self.lock.release()
+            with SIM_LOCK:
+                for msg in pending:
+                    self.mirror.replay_step(*msg)
+                for k, col in rows.items():
+                    self.mirror._arr[k][:] = col
+            publish_step()
+
+    def _next_event(self):
+        """Next step message from the child, or None once it has stopped or died."""
+        while True:
+            try:
+                return self.events.get(timeout=1)
+            except queue.Empty:
+                if not self.process.is_alive():
+                    return None
+
+    def _acquire_child_lock(self):
+        """Take the cross-process lock; False if the child died, possibly while holding it."""
+        while not self.lock.acquire(timeout=1):
+            if not self.process.is_alive():
+                return False
+        return True
+
+    def alive(self):
+        return self.process.is_alive() and self.pump.is_alive()
+
+    def close(self):
+        self.control.put('quit')
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+        # The pump notices a dead child within a second; don't hang shutdown if it doesn't
+        self.pump.join(timeout=5)
+        if not self.pump.is_alive():
+            self.shm.close()
+        self.shm.unlink()
+
+def _put_event(events, parent, msg):
+    """Queue msg for the server; False if the server died while the queue was full."""
     while True:
-        with SIM_LOCK:
-            if not RUNNING or MODEL is None:
-                pass
-            else:
-                MODEL.step()
-        time.sleep(0.9)
+        try:
+            events.put(msg, timeout=1)
+            return True
+        except queue.Full:
+            if not parent.is_alive():
+                return False
+
+def sim_main(tasks, shm_name, lock, control, events):
+    """Child process entry point: step a model over the shared task store on command."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    model = UserModel(tasks=tasks, store=shared_task_store(shm.buf, len(tasks)))
+    _, minute_offset = task_store_layout(len(tasks))
+    parent = mp.parent_process()
+    running = False
+    try:
+        while True:
+            try:
+                cmd = control.get(timeout=0.9)
+            except queue.Empty:
+                if not parent.is_alive():
+                    break  # the server went away without sending 'quit'
+                cmd = None
+            if cmd == 'quit':
+                break
+            if cmd in ('start', 'stop'):
+                running = cmd == 'start'
+            steps = 1 if cmd == 'step' else SIM_SPEED if running and cmd is None else 0
+            for _ in range(steps):
+                with lock:
+                    model.step()
+                    now = model.time_minute
+                    struct.pack_into('q', shm.buf, minute_offset, now)
+                    msg = (now, model.num_completed, model.focus_log[-1],
+                           list(takewhile(lambda r: r[0] == now, model.reminders)))
+                if not _put_event(events, parent, msg):
+                    return
+    except Exception:
+        traceback.print_exc()
+    finally:
+        _put_event(events, parent, None)  # ends the pump; ensure_sim() then restarts the simulation
+        if not parent.is_alive():
+            events.cancel_join_thread()  # nobody is left to drain the queue
 
 if __name__ == '__main__':
+    from waitress import serve
     print('Starting Flask app — open http://127.0.0.1:5000')
-    app.run(debug=True)
+    serve(app, host='127.0.0.1', port=5000, threads=MAX_STREAMS + 8)